@@ -2,29 +2,59 @@ from matplotlib import pyplot as plt
 import fastf1
 import fastf1.plotting
 import numpy as np
-import datetime
-import tkinter as tk
-from fastf1.ergast import Ergast
-import customtkinter as ctk
-from tkinter import simpledialog
-fastf1.plotting.setup_mpl()
+import sys
+from functools import lru_cache
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from matplotlib.ticker import FuncFormatter
+fastf1.plotting.setup_mpl(mpl_timedelta_support=False)
+
+# a cor de cada equipa não muda entre sessões, por isso só é pedida ao fastf1 uma vez;
+# o nome só é procurado na chamada, para o import do módulo não falhar nas versões do fastf1 sem team_color
+@lru_cache(maxsize=None)
+def _team_color(team):
+    return fastf1.plotting.team_color(team)
+
+
+# prepara as voltas de uma sessão uma única vez: tempos em segundos e agrupamento por piloto;
+# fica guardado na própria sessão, para ser libertado junto com ela
+def _prep_laps(session):
+    prepared = getattr(session, '_f1data_prepared', None)
+    if prepared is None:
+        laps = session.laps.assign(**{'LapTime (s)': session.laps['LapTime'].dt.total_seconds()})
+        by_driver = dict(list(laps.groupby('Driver', sort=False)))
+        prepared = session._f1data_prepared = (laps, by_driver)
+    return prepared
+
+
+# cores do ciclo do matplotlib para n linhas, as mesmas que ax.plot usaria
+def _cycle_colors(n):
+    cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    return [cycle[i % len(cycle)] for i in range(n)]
+
+
+# formata um tempo de volta em segundos como m:ss.sss (aritmética inteira em milissegundos)
+def _format_lap_time(x, pos=None):
+    minutes, millis = divmod(int(round(x * 1000)), 60000)
+    return f"{minutes}:{millis // 1000:02d}.{millis % 1000:03d}"
 
 
 # a script that receives drivers and a session and plots their pace for comparison
 
 def plot_pace_comparison(drivers, session):
-    
-    fig, ax = plt.subplots()
+    _, by_driver = _prep_laps(session)
+    fig, ax = plt.subplots(constrained_layout=True)
     for driver in drivers:
-        print(driver)
-        fast_driver = session.laps.pick_driver(driver).pick_fastest()
-        print(fast_driver)
+        if driver not in by_driver:
+            continue
+        fast_driver = by_driver[driver].pick_fastest()
         driver_car_data = fast_driver.get_car_data()
-        t = driver_car_data['Time']
-        vCar = driver_car_data['Speed']
+        # arrays numpy em segundos, sem passar pelo conversor de timedelta do matplotlib
+        t = driver_car_data['Time'].dt.total_seconds().to_numpy()
+        vCar = driver_car_data['Speed'].to_numpy()
         ax.plot(t, vCar, label=driver)
 
-    ax.set_xlabel('Time')
+    ax.set_xlabel('Time [s]')
     ax.set_ylabel('Speed [Km/h]')
     ax.set_title('Pace comparison')
     ax.legend()
@@ -36,29 +66,14 @@ def plot_mean_lap_time(race):
     # Carrega os dados da corrida
 
     # Cria uma figura e um eixo para o gráfico
-    fig, ax = plt.subplots()
-
-    # Dicionário para armazenar os tempos médios de volta de cada piloto
-    mean_lap_times = {}
-    drivers = race.results['Abbreviation'].values
-
-    for driver in drivers:
-        # Filtra os dados para o piloto e o composto de pneu especificado
-        laps = race.laps.pick_quicklaps()
-        driver_laps = laps.pick_driver(driver)
+    fig, ax = plt.subplots(constrained_layout=True)
 
+    # Filtra as voltas rápidas uma única vez e calcula o tempo médio de volta de cada piloto numa só passagem
+    laps = _prep_laps(race)[0].pick_quicklaps()
+    mean_lap_times = laps.groupby('Driver')['LapTime (s)'].mean().sort_values()
 
-        # Calcula o tempo médio de volta, excluindo outliers
-        lap_times = driver_laps['LapTime'].astype('int64').values / 1e3  # Converte para microssegundos
-        mean_lap_times[driver] = np.mean(lap_times)
-
-    # Ordena os pilotos por tempo médio de volta
-    sorted_drivers = sorted(mean_lap_times, key=mean_lap_times.get)
-
-    for driver in sorted_drivers:
-        td = datetime.timedelta(microseconds=int(mean_lap_times[driver]))
-        # Adiciona os dados ao gráfico
-        bar = ax.bar(driver, td.total_seconds())
+    # Adiciona todas as barras ao gráfico numa só chamada, uma cor por piloto
+    ax.bar(mean_lap_times.index, mean_lap_times.to_numpy(), color=_cycle_colors(len(mean_lap_times)))
 
     # Configura o gráfico
     ax.set_xlabel('Driver')
@@ -67,8 +82,8 @@ def plot_mean_lap_time(race):
     ax.grid(True)
 
     # Ajusta os limites do eixo y para "dar um zoom" nos dados
-    min_time = min([bar.get_height() for bar in ax.containers[0]]) - 1
-    max_time = max([bar.get_height() for bar in ax.containers[0]]) + 5
+    min_time = mean_lap_times.iloc[0] - 1
+    max_time = mean_lap_times.iloc[-1] + 5
     ax.set_ylim([min_time, max_time])
 
     # Mostra o gráfico
@@ -76,115 +91,142 @@ def plot_mean_lap_time(race):
 
 #get a graph of laps and lap times of a driver or a list of drivers
 def plot_lap_times(drivers, session):
-    fig, ax = plt.subplots()
+    _, by_driver = _prep_laps(session)
+    segments, labels = [], []
     for driver in drivers:
-        driver_laps= session.laps.pick_driver(driver)
-        # print driver_car_data columns
-        print(driver_laps.columns)
-        lap_number = driver_laps['LapNumber']
-        time = driver_laps['LapTime']
-        ax.plot(lap_number, time, label=driver)
+        driver_laps = by_driver.get(driver)
+        if driver_laps is None:
+            continue
+        segments.append(np.column_stack([driver_laps['LapNumber'], driver_laps['LapTime (s)']]))
+        labels.append(driver)
+
+    # todas as linhas num único artista
+    fig, ax = plt.subplots(constrained_layout=True)
+    colors = _cycle_colors(len(segments))
+    ax.add_collection(LineCollection(segments, colors=colors))
+    ax.autoscale_view()
 
     ax.set_xlabel('Lap number')
-    ax.set_ylabel('Lap time [s]')
+    ax.set_ylabel('Lap time')
+    ax.yaxis.set_major_formatter(FuncFormatter(_format_lap_time))
     ax.set_title('Pace comparison')
-    ax.legend()
+    ax.legend([Line2D([], [], color=c) for c in colors], labels)
     plt.show()
-    
-import matplotlib.pyplot as plt
-
-import numpy as np
 
 def plot_race_history(session):
     # cria um grafico que compara a soma dos tempos de volta de cada piloto com o delta do tempo de volta
     # volta de referencia para o delta é a media dos tempos de volta do piloto que ganhou a corrida
-    #obter o piloto que ganhou a corrida
     drivers = session.results['Abbreviation'].values
-    winner = session.results['Abbreviation'].iloc[0]
-    print(session.results)
-    driver_laps = session.laps.pick_driver(winner)
+    _, by_driver = _prep_laps(session)
     
+    #obter o tempo do piloto que ganhou a corrida
     time = session.results['Time'].iloc[0]
     #pandas time delta to seconds
     reference_lap_time = time.total_seconds()/session.total_laps
 
-    print(session.total_laps)
-
     # a cada volta, calcular a diferença entre a soma do tempo das voltas dadas até a volta atual e a referência * numero de voltas até a volta atual
     # e plotar no gráfico
-    fig, ax = plt.subplots()
+    segments, labels = [], []
     for driver in drivers:
-        driver_laps = session.laps.pick_driver(driver)
-        # se alguma volta for negativa, trocar o valor para a media da volta anterior com a volta seguinte
-        # get lap times from nanoseconds to seconds
-        lap_times = driver_laps['LapTime'].astype('int64').values / 1e9
-        # se alguma volta for negativa, trocar o valor para a media da volta anterior com a volta seguinte
-        for i in range(1, len(lap_times)-1):
-            if lap_times[i] < 0:
-                lap_times[i] = (lap_times[i-1] + lap_times[i+1]) / 2
-        cumulative_times = np.cumsum(lap_times)
-        
-        delta_lap_times = np.array([reference_lap_time * i for i in range(1, len(cumulative_times)+1)])
-
-            
+        driver_laps = by_driver.get(driver)
+        if driver_laps is None:
+            continue
+        # lap times in seconds, converted once per session (NaN where the lap has no time)
+        lap_times = driver_laps['LapTime (s)'].to_numpy()
+        # se alguma volta for negativa ou sem tempo, interpolar o valor a partir das voltas válidas vizinhas
+        valid = lap_times > 0
+        if not valid.any():
+            continue
+        lap_index = np.arange(len(lap_times))
+        lap_times = np.interp(lap_index, lap_index[valid], lap_times[valid])
+
+        # referência * numero de voltas menos a soma acumulada dos tempos, numa só expressão
+        delta_times = reference_lap_time * (lap_index + 1.0) - np.cumsum(lap_times)
+
         # em caso de abandono, retirar a ultima volta do piloto
-        if len(cumulative_times) < session.total_laps - 1:
-            cumulative_times = cumulative_times[:-1]
-            delta_lap_times = delta_lap_times[:-1]
-        
-        if winner == driver:
-            print(len(cumulative_times))
-
-        ax.plot(range(1, len(cumulative_times) + 1), delta_lap_times - cumulative_times, label=driver)
-    
+        if len(delta_times) < session.total_laps - 1:
+            delta_times = delta_times[:-1]
+
+        segments.append(np.column_stack([lap_index[:len(delta_times)] + 1, delta_times]))
+        labels.append(driver)
+
+    # todas as linhas num único artista
+    fig, ax = plt.subplots(constrained_layout=True)
+    colors = _cycle_colors(len(segments))
+    ax.add_collection(LineCollection(segments, colors=colors))
+    ax.autoscale_view()
+
     ax.set_xlabel('Lap number')
     ax.set_ylabel('Delta lap time [s]')
-    ax.legend()
+    ax.legend([Line2D([], [], color=c) for c in colors], labels)
     plt.show()
 
-import seaborn as sns
 def plot_team_pace_comparison(session):
-    fastf1.plotting.setup_mpl(mpl_timedelta_support=False, misc_mpl_mods=False)
-    laps = session.laps.pick_quicklaps()
-    transformed_laps = laps.copy()
-    transformed_laps.loc[:, "LapTime (s)"] = laps["LapTime"].dt.total_seconds()
+    transformed_laps = _prep_laps(session)[0].pick_quicklaps()
+    lap_times = transformed_laps["LapTime (s)"]
+    teams = transformed_laps["Team"]
+
+    # box statistics of every team in one pass (whiskers at 1.5 IQR, the same rule seaborn used)
+    quartiles = lap_times.groupby(teams).quantile([0.25, 0.5, 0.75]).unstack()
+    q1 = teams.map(quartiles[0.25])
+    q3 = teams.map(quartiles[0.75])
+    iqr = q3 - q1
+    inlier = lap_times.between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+    whiskers = lap_times[inlier].groupby(teams[inlier]).agg(["min", "max"])
+    fliers = {team: times.to_numpy() for team, times in lap_times[~inlier].groupby(teams[~inlier])}
 
     # order the team from the fastest (lowest median lap time) tp slower
-    team_order = (
-        transformed_laps[["Team", "LapTime (s)"]]
-        .groupby("Team")
-        .median()["LapTime (s)"]
-        .sort_values()
-        .index
-    )
-    print(team_order)
+    team_order = quartiles[0.5].sort_values().index
     # make a color palette associating team names to hex codes
-    team_palette = {team: fastf1.plotting.team_color(team) for team in team_order}
-    fig, ax = plt.subplots(figsize=(15, 10))
-    sns.boxplot(
-        data=transformed_laps,
-        x="Team",
-        y="LapTime (s)",
-        hue="Team",
-        order=team_order,
-        palette=team_palette,
+    team_palette = {team: _team_color(team) for team in team_order}
+    bxpstats = [
+        {
+            "label": team,
+            "q1": quartiles.at[team, 0.25],
+            "med": quartiles.at[team, 0.5],
+            "q3": quartiles.at[team, 0.75],
+            "whislo": whiskers.at[team, "min"],
+            "whishi": whiskers.at[team, "max"],
+            "fliers": fliers.get(team, []),
+        }
+        for team in team_order
+    ]
+
+    fig, ax = plt.subplots(figsize=(15, 10), constrained_layout=True)
+    boxes = ax.bxp(
+        bxpstats,
+        patch_artist=True,
         whiskerprops=dict(color="white"),
         boxprops=dict(edgecolor="white"),
         medianprops=dict(color="grey"),
         capprops=dict(color="white"),
     )
+    for box, team in zip(boxes["boxes"], team_order):
+        box.set_facecolor(team_palette[team])
 
+    ax.set_ylabel("LapTime (s)")
     plt.title(session)
     plt.grid(visible=False)
 
     # x-label is redundant
     ax.set(xlabel=None)
-    plt.tight_layout()
     plt.show()
 
     
-def test_pace_comparison(year, n_test, session):
+# pede os pilotos na linha de comandos, sem abrir uma janela Tk; sem terminal usa os pilotos por omissão
+def _prompt_drivers(available, default):
+    if not sys.stdin.isatty():
+        return default
+    answer = input(f"Drivers ({' '.join(available)}) [{' '.join(default)}]: ").upper().split()
+    return answer or default
+
+
+# entrada para a linha de comandos: a interface carrega os testes pela sua própria cache de sessões
+def test_pace_comparison(year, n_test, session, drivers=None):
     session = fastf1.get_testing_session(year, n_test, session)
-    session.load()
-    plot_pace_comparison(session)
+    session.load(telemetry=True, weather=False)
+    if drivers is None:
+        available = list(session.results['Abbreviation'])
+        drivers = _prompt_drivers(available, available[:3])
+    plot_pace_comparison(drivers, session)
     plot_mean_lap_time(session)
\ No newline at end of file
@@ -1,17 +1,76 @@
 
     
-from matplotlib import pyplot as plt
 import fastf1
-import fastf1.plotting
-import numpy as np
-import datetime
-import tkinter as tk
-from fastf1.ergast import Ergast
+import threading
 import customtkinter as ctk
-from tkinter import simpledialog
-fastf1.plotting.setup_mpl()
-import customtkinter as ctk
-import functions as f
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# thread para carregar as sessões sem bloquear a janela
+_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+
+# sessões já carregadas ou a carregar, por (ano, pista, sessão, teste?) -> (future da sessão, com telemetria?), das mais antigas para as mais recentes
+_SESSIONS = OrderedDict()
+_MAX_SESSIONS = 16
+_SESSIONS_LOCK = threading.Lock()
+
+# funções que precisam da telemetria do carro (get_car_data); as outras só usam as voltas
+_NEEDS_TELEMETRY = {1, 6}
+
+
+# devolve a sessão carregada, sem voltar a carregar a mesma corrida a cada clique;
+# a telemetria só é carregada quando o gráfico precisa dela e o tempo não é carregado;
+# nos testes de pré-temporada, track e session são o número do teste e o número da sessão
+def _get_loaded_session(year, track, session, telemetry=False, testing=False):
+    key = (year, track, session, testing)
+    # o lock só protege o dicionário; quem chega primeiro regista um future e carrega fora do lock,
+    # as outras threads que pedem a mesma sessão esperam por esse future em vez de a carregar outra vez
+    with _SESSIONS_LOCK:
+        cached = _SESSIONS.get(key)
+        owner = cached is None or (telemetry and not cached[1])
+        if owner:
+            cached = _SESSIONS[key] = (Future(), telemetry)
+        _SESSIONS.move_to_end(key)
+        while len(_SESSIONS) > _MAX_SESSIONS:
+            _SESSIONS.popitem(last=False)
+
+    future = cached[0]
+    if owner:
+        try:
+            if testing:
+                loaded = fastf1.get_testing_session(year, track, session)
+            else:
+                loaded = fastf1.get_session(year, track, session)
+            loaded.load(telemetry=telemetry, weather=False)
+        except Exception as e:
+            # retira a entrada para o próximo pedido tentar carregar de novo
+            with _SESSIONS_LOCK:
+                if _SESSIONS.get(key) is cached:
+                    del _SESSIONS[key]
+            future.set_exception(e)
+            raise
+        future.set_result(loaded)
+    return future.result()
+
+
+# pré-carrega uma sessão em segundo plano; se falhar (sem rede, evento desconhecido) não mostra nada,
+# a entrada falhada já saiu da cache e o clique do utilizador volta a tentar
+def _preload_session(year, track, session, telemetry=False):
+    try:
+        _get_loaded_session(year, track, session, telemetry)
+    except Exception:
+        pass
+
+
+# cria uma linha "label + entry" na janela e devolve a entry já com o valor padrão
+def _add_entry(window, row, text, default):
+    label = ctk.CTkLabel(window, text=text)
+    label.grid(row=row, column=0, padx=20, pady=20, sticky="ew")
+    entry = ctk.CTkEntry(window)
+    entry.insert(0, default)  # Valor padrão
+    entry.grid(row=row, column=1, padx=20, pady=20, sticky="ew")
+    return entry
 
 
 def get_details(func):
@@ -21,49 +80,40 @@ def get_details(func):
     window.title("F1 stats tool")
     window.geometry("400x400")
     
-    year_label = ctk.CTkLabel(window, text="Enter the year:")
-    year_label.grid(row=0, column=0, padx=20, pady=20, sticky="ew")
-    year_entry = ctk.CTkEntry(window)
-    year_entry.insert(0, "2023")  # Valor padrão
-    year_entry.grid(row=0, column=1, padx=20, pady=20, sticky="ew")
-
-    # track label
-    track_label = ctk.CTkLabel(window, text="Enter the track:")
-    track_label.grid(row=1, column=0, padx=20, pady=20, sticky="ew")
-    track_entry = ctk.CTkEntry(window)
-    track_entry.insert(0, "Austria")  # Valor padrão
-    track_entry.grid(row=1, column=1, padx=20, pady=20, sticky="ew")
-
-    # session label
-    session_label = ctk.CTkLabel(window, text="Enter the session:")
-    session_label.grid(row=2, column=0, padx=20, pady=20, sticky="ew")
-    session_entry = ctk.CTkEntry(window)
-    session_entry.insert(0, "R")  # Valor padrão
-    session_entry.grid(row=2, column=1, padx=20, pady=20, sticky="ew")
-
-    # drivers label
-    drivers_label = ctk.CTkLabel(window, text="Enter the drivers:")
-    drivers_label.grid(row=3, column=0, padx=20, pady=20, sticky="ew")
-    drivers_entry = ctk.CTkEntry(window)
-    drivers_entry.insert(0, "VER BOT HAM")  # Valor padrão
-    drivers_entry.grid(row=3, column=1, padx=20, pady=20, sticky="ew")
-    
-    testing_session = ctk.CTkLabel(window, text="Testing session")
-    testing_session.grid(row=4, column=0, padx=20, pady=20, sticky="ew")
-    testing_entry = ctk.CTkEntry(window)
-    testing_entry.insert(0, "1 1")  # Valor padrão
-    testing_entry.grid(row=4, column=1, padx=20, pady=20, sticky="ew")
+    year_entry = _add_entry(window, 0, "Enter the year:", "2023")
+    track_entry = _add_entry(window, 1, "Enter the track:", "Austria")
+    session_entry = _add_entry(window, 2, "Enter the session:", "R")
+    drivers_entry = _add_entry(window, 3, "Enter the drivers:", "VER BOT HAM")
+    testing_entry = _add_entry(window, 4, "Testing session", "1 1")
 
     # button retorna os valores inseridos pela funcao  
     def on_enter():
         year = int(year_entry.get())
         track = track_entry.get()
         session = session_entry.get()
-        drivers = drivers_entry.get().split()
+        # pilotos em maiúsculas e sem repetidos, para não desenhar o mesmo piloto duas vezes
+        drivers = tuple(dict.fromkeys(drivers_entry.get().upper().split()))
         testing = testing_entry.get().split()
-        session = fastf1.get_session(year, track, session)
-        
-        session.load()
+        # o teste de pré-temporada usa o número do teste e da sessão em vez da pista e da sessão
+        if func == 6:
+            track, session = int(testing[0]), int(testing[1])
+
+        button.configure(state="disabled")
+        # carrega a sessão numa thread; a janela vai verificando se já acabou, para o plot correr no mainloop do Tk
+        future = _EXECUTOR.submit(_get_loaded_session, year, track, session, func in _NEEDS_TELEMETRY, func == 6)
+        wait(future, drivers)
+
+    # o tkinter e o matplotlib não são thread-safe, por isso só a thread do Tk toca na janela e nos gráficos
+    def wait(future, drivers):
+        if not future.done():
+            window.after(100, wait, future, drivers)
+            return
+        button.configure(state="normal")
+        plot(future.result(), drivers)
+
+    def plot(session, drivers):
+        # o matplotlib e o setup_mpl do fastf1 só são carregados no primeiro gráfico
+        import functions as f
         if func == 1:
             f.plot_pace_comparison(drivers, session)
         elif func == 2:
@@ -76,7 +126,8 @@ def get_details(func):
         elif func == 5:
             f.plot_team_pace_comparison(session)
         elif func == 6:
-            f.test_pace_comparison(year, int(testing[0]), int(testing[1]))
+            f.plot_pace_comparison(drivers, session)
+            f.plot_mean_lap_time(session)
 
     # button
     button = ctk.CTkButton(window, text="Enter", command=on_enter)
@@ -86,6 +137,10 @@ def get_details(func):
     window.mainloop()
 
 def main():
+    # carrega já a sessão padrão (2023 Austria R) em segundo plano, enquanto o utilizador lê a janela;
+    # thread daemon para o Exit não ficar à espera deste carregamento
+    threading.Thread(target=_preload_session, args=(2023, "Austria", "R", True), daemon=True).start()
+
     ctk.set_appearance_mode('dark')
     ctk.set_default_color_theme('dark-blue')
     window = ctk.CTk()